@@ -5,6 +5,7 @@ import os
 
 sys.path.insert(0, "./src")
 from markov_chain import Markovchain
+from utils import streamTokens
 
 print("\n" + "=" * 60)
 print("MARKOV CHAIN CLI")
@@ -34,18 +35,14 @@ else:
     print(f"\nUsing data file: {filepath}")
 
 try:
-    print("Reading file...")
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        text = f.read()
+    print(f"File size: {os.path.getsize(filepath) / 1e6:.1f} MB")
 
-    print(f"File loaded: {len(text.split())} words")
-
-    # Train
+    # Train, streaming words straight from the file instead of reading it all in
     print(f"\nTraining model (order={order})...")
     startTime = time.time()
 
     model = Markovchain(order=order)
-    model.train(text)
+    model.trainStream(streamTokens(filepath))
 
     trainTime = time.time() - startTime
     print(f"Training completed in {trainTime:.2f} seconds\n")
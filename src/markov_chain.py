@@ -12,8 +12,41 @@ Most of this code is basic probability
 ps- this is my first time using anonymous functions, so code might be inefficient
 """
 
+from array import array
+from bisect import bisect_right
 from collections import defaultdict
+from functools import lru_cache
+from itertools import accumulate, chain, islice, repeat
+from operator import add, indexOf, itemgetter, sub
+from types import MappingProxyType
+import heapq
 import random
+import sys
+
+# texts up to this many characters get their tokens memoized, anything bigger (a corpus)
+# is tokenized fresh every time so the cache never keeps a whole corpus alive
+TOKEN_CACHE_MAX_CHARS = 1 << 16
+
+# what getTransitions hands back for a context it has never seen,
+# shared so misses don't allocate
+_EMPTY = MappingProxyType({})
+
+
+def _splitWords(text):
+    """Lowercase, split on whitespace and intern, as a tuple so it can be cached"""
+    return tuple(map(sys.intern, text.lower().split()))
+
+
+_splitWordsCached = lru_cache(maxsize=128)(_splitWords)
+
+
+def _pairs(words, order):
+    """
+    (context, nextWord) pairs over a word list, the context being the `order` words
+    before nextWord. Order 0 has the empty context before every word
+    """
+    contexts = zip(*(words[i:] for i in range(order))) if order else repeat(())
+    return zip(contexts, words[order:])
 
 
 class Markovchain:
@@ -24,9 +57,27 @@ class Markovchain:
             - self.transistions: {word:{next_word:count,...}}
         Example: {"the"{"cat": 5, "dog":3, "mat":2}}
         After "the", we've seen cat 5 times and dog 3 times
+        The outer dict makes a row for a new context on its own, but the rows are plain
+        dicts, so add to a count with row[w] = row.get(w, 0) + n (row[w] += n raises
+        KeyError for a word the row doesn't have yet)
 
     - self.vocabulary: this is a set containing all the unique words we have seen
 
+    On first use after training, finalize() packs the counts into flat int arrays
+    (CSR layout):
+    - self.contextId: {context: row}
+    - self.contextPtr: row r owns entries contextPtr[r] to contextPtr[r + 1]
+    - self.nextIds: next word id for each entry
+    - self.idWord: id -> word
+    - self.nextTotals: running total of the counts within each row,
+      "sample" predictions bisect it. An entry's own count is its total minus
+      the one before it (in the same row)
+    - totals are never negative, so they are an unsigned ("I") array, 4 bytes an entry
+    - self.bestEntry: the entry of each row with the highest count
+    - self.successorRows: for each entry, the row of the context you land in
+      after taking that next word (context minus its first word, plus the next word),
+      or -1 if unseen. generateText fills it on its first call, it is None until then
+
     """
 
     def __init__(self, order=1) -> None:
@@ -41,16 +92,32 @@ class Markovchain:
         """
         self.order = order
 
-        self.transitions = defaultdict(lambda: defaultdict(int))
+        # the rows are plain dicts (not defaultdicts), so reading a missing next word
+        # through getTransitions raises KeyError instead of inserting a 0 count
+        self.transitions = defaultdict(dict)
 
         self.vocabulary = set()
 
         self.transistionCount = 0
 
+        self.idWord = []
+        self.contextId = {}
+        self.contextPtr = array("i", [0])
+        self.nextIds = array("i")
+        self.nextTotals = array("I")
+        self.bestEntry = array("i")
+        self.successorRows = array("i")
+
+        # training only folds counts in, the arrays above are packed on first use
+        self._packed = True
+
     def tokenize(self, text):
         """
         Convert text string into a list of word (tokens)
         My approach is to just normalize everything(basically lowercase everything) and split on whitespace
+        Every token is interned, so repeated words share one string object and
+        context tuples hash/compare by identity when we look them up later.
+        Short texts are memoized, so tokenizing the same string again is just a copy
 
         Args:
             text (str): Raw text to tokenize
@@ -62,9 +129,12 @@ class Markovchain:
             "The cat sat on the bed" -> ["the", "cat", "sat", "on", "the", "bed"]
         """
 
-        text = text.lower()
-
-        words = text.split()
+        if len(text) <= TOKEN_CACHE_MAX_CHARS:
+            words = list(_splitWordsCached(text))
+        else:
+            # too big to cache, so build the list directly
+            # instead of going through a tuple
+            words = list(map(sys.intern, text.lower().split()))
 
         return words
 
@@ -108,22 +178,159 @@ class Markovchain:
         # Tokenize
         words = self.tokenize((text))
 
-        for i in range(len(words) - self.order):
-            context = tuple(words[i : i + self.order])
-            nextWord = words[i + self.order]
-            self.transitions[context][nextWord] += 1
-            # the number of times we saw a new word
-            self.transistionCount += 1
+        # fold every (context, next word) pair straight into the rows. Counting the
+        # windows in a Counter first only adds a pass, the fold re-hashes them anyway
+        self._foldPairs(_pairs(words, self.order))
+        self._finishTraining(len(words), words)
+
+    def trainStream(self, tokens, chunkSize=1_000_000):
+        """
+        Same as train(), but for a stream of tokens instead of one big string.
+        Useful for corpora too big to hold in memory as a string plus a word list
 
-            self.vocabulary.add(nextWord)
-            for word in context:
-                self.vocabulary.add(word)
+        The tokens are counted chunkSize at a time, and the last `order` tokens of
+        each chunk are carried into the next one so no window is lost at the seams
 
-        print(f"Trained on {len(words)} words")
+        Args:
+            tokens: Iterable of already normalized words (see utils.streamTokens)
+            chunkSize: How many tokens to hold in memory at once
+
+        Example:
+            model = Markovchain(order=2)
+            model.trainStream(streamTokens("./MarkovData/gutenberg_combined.txt"))
+        """
+        order = self.order
+        tokens = iter(tokens)
+        seen = set()
+        wordCount = 0
+        carry = []
+
+        while True:
+            chunk = list(islice(tokens, chunkSize))
+            if not chunk:
+                break
+            wordCount += len(chunk)
+            seen.update(chunk)
+
+            # each chunk is folded straight in, so only one chunk of pairs is ever alive
+            words = carry + chunk
+            self._foldPairs(_pairs(words, order))
+
+            # not words[-order:], which is the whole list when order is 0
+            carry = words[len(words) - order :]
+
+        self._finishTraining(wordCount, seen)
+
+    def _foldPairs(self, pairs):
+        """
+        Fold (context, nextWord) pairs into self.transitions, each pair counting once
+
+        Args:
+            pairs: Iterable of (context tuple, next word), see _pairs
+        """
+        # one iteration per token, the context tuples come out of zip ready made
+        transitions = self.transitions
+        for context, nextWord in pairs:
+            row = transitions[context]
+            row[nextWord] = row.get(nextWord, 0) + 1
+
+    def _finishTraining(self, wordCount, words):
+        """Book-keeping shared by every training path, after the counts are folded in"""
+        # once there is a single window every token is part of one, so the vocabulary
+        # is just the tokens (a C-level set update, not a set.add per window word)
+        if wordCount > self.order:
+            self.vocabulary.update(words)
+
+        # the number of times we saw a new word
+        self.transistionCount += max(wordCount - self.order, 0)
+
+        # packing waits for the first prediction, so a run of train() calls packs once
+        self._packed = False
+
+        print(f"Trained on {wordCount} words")
         print(f"Vocabulary size: {len(self.vocabulary)}")
         print(f"Unique transitions learned: {len(self.transitions)}")
         print(f"Order: {self.order}")
 
+    def finalize(self):
+        """
+        Pack self.transitions into the flat arrays described on the class.
+        You rarely need to call this: predictNext, generateText and topContexts pack
+        the model on their first call after training. Call it yourself after editing
+        an existing context in self.transitions by hand, so the packed answers see it
+        (rows are plain dicts, so add to one with row[w] = row.get(w, 0) + n)
+
+        Every context gets a row, and the next words of that row sit next to each other
+        in nextIds/nextTotals. Scanning a row is then a walk over a small slice of ints
+        instead of a walk over dict entries
+
+        The rows are laid out back to back, so every table is built in one map/chain
+        pass over all of them and there is no python level loop here at all
+        """
+        # a context with no next words (e.g. left behind by reading
+        # self.transitions[context]) gets no row, the same way getTransitions
+        # treats it as never seen
+        transitions = self.transitions
+        if not all(transitions.values()):
+            transitions = {
+                context: nextWords
+                for context, nextWords in transitions.items()
+                if nextWords
+            }
+        rows = transitions.values()
+
+        idWord = list(dict.fromkeys(chain.from_iterable(rows)))
+        wordId = dict(zip(idWord, range(len(idWord))))
+        contextId = dict(zip(transitions, range(len(transitions))))
+
+        contextPtr = array("i", [0])
+        contextPtr.extend(accumulate(map(len, rows)))
+        nextIds = array("i", map(wordId.__getitem__, chain.from_iterable(rows)))
+
+        # sampling bisects a running total of the counts, restarted at every row
+        nextTotals = array(
+            "I", chain.from_iterable(map(accumulate, map(dict.values, rows)))
+        )
+
+        # the "max" answer never changes for a context, so its entry is worked out
+        # here: the first entry of the row holding the row's biggest count
+        rowMax = map(max, map(dict.values, rows))
+        bestOffsets = map(indexOf, map(dict.values, rows), rowMax)
+        bestEntry = array("i", map(add, contextPtr, bestOffsets))
+
+        self.idWord = idWord
+        self.contextId = contextId
+        self.contextPtr = contextPtr
+        self.nextIds = nextIds
+        self.nextTotals = nextTotals
+        self.bestEntry = bestEntry
+        # only generateText walks these, so it builds them on its first call
+        self.successorRows = None
+        self._packed = True
+
+    def _ensurePacked(self):
+        """Pack the model if it was trained since the last finalize()"""
+        if not self._packed:
+            self.finalize()
+
+    def _packSuccessors(self):
+        """
+        Fill self.successorRows for the packed rows, the one table only generation
+        needs. Every context is slid along by each of its next words (drop the first
+        word, append the next one) and we look up the row it lands in
+        """
+        # read from the packed rows, not self.transitions, so a row edited by hand
+        # since finalize() can't knock the entries out of line
+        contextId = self.contextId
+        contextPtr = self.contextPtr
+        rowLengths = map(sub, contextPtr[1:], contextPtr)
+        tails = chain.from_iterable(
+            map(repeat, map(itemgetter(slice(1, None)), contextId), rowLengths)
+        )
+        nextWords = map(self.idWord.__getitem__, self.nextIds)
+        shifted = map(add, tails, zip(nextWords))
+        self.successorRows = array("i", map(contextId.get, shifted, repeat(-1)))
+
     def getTransitions(self, context):
         """
         Get all possible next words after a given context with their counts.
@@ -135,8 +342,13 @@ class Markovchain:
                      - For order=3: a tuple of 3 words, e.g., ("the", "cat", "sat")
 
         Returns:
-            Dictionary where keys are possible next words and values are counts
-            Returns empty dict if context not found in training data
+            Read-only mapping where keys are possible next words and values are counts
+            Returns an empty mapping if context not found in training data
+            Reading a word that never followed the context raises KeyError, and nothing
+            you do through the mapping can change the model
+
+            This is a live view of the model's counts, not a copy, so it costs nothing
+            for big fanouts (e.g. "the"). Use dict(...) on it if you need to modify it
 
         Example for order=1:
             model.getTransitions("the") ->{"cat": 2, "dog": 3}
@@ -147,7 +359,8 @@ class Markovchain:
         if isinstance(context, str):
             context = (context,)
 
-        return dict(self.transitions.get(context, {}))
+        counts = self.transitions.get(context)
+        return MappingProxyType(counts) if counts else _EMPTY
 
     def predictNext(self, context, method="max"):
         """
@@ -177,23 +390,45 @@ class Markovchain:
         if isinstance(context, str):
             context = (context,)
 
-        nextWord = self.transitions.get(context, {})
-        if not nextWord:
-            return None
+        self._ensurePacked()
+        return self._predictNextCtx(context, method)
 
+    def _predictNextCtx(self, context, method):
+        """
+        predictNext without the input checks, context must already be a tuple.
+        The finalize() caches are tried first, self.transitions is only read on a miss
+        """
         if method == "max":
-            maxWord = max(nextWord, key=nextWord.get)
-            return maxWord
+            row = self.contextId.get(context)
+            if row is not None:
+                return self.idWord[self.nextIds[self.bestEntry[row]]]
 
         elif method == "sample":
-            total = sum(nextWord.values())
-            probabilites = {w: count / total for w, count in nextWord.items()}
+            row = self.contextId.get(context)
+            if row is not None:
+                # pick a point in [0, total) and find which word's share
+                # of the running total it lands in
+                start, end = self.contextPtr[row], self.contextPtr[row + 1]
+                totals = self.nextTotals
+                entry = bisect_right(
+                    totals, random.random() * totals[end - 1], start, end
+                )
+                return self.idWord[self.nextIds[entry]]
 
-            words = list(probabilites.keys())
-            probs = list(probabilites.values())
+        else:
+            return None
 
-            chose = random.choices(words, weights=probs, k=1)[0]
-            return chose
+        # context was added after finalize() (or never seen),
+        # work from its counts directly
+        nextWord = self.transitions.get(context)
+        if not nextWord:
+            return None
+
+        if method == "max":
+            return max(nextWord.items(), key=itemgetter(1))[0]
+
+        words, totals = list(nextWord), list(accumulate(nextWord.values()))
+        return words[bisect_right(totals, random.random() * totals[-1])]
 
     def generateText(self, startContext, length=10, method="max"):
         """
@@ -223,16 +458,88 @@ class Markovchain:
             context = startContext
 
         generatedWords = list(context)
+        self._ensurePacked()
+        if self.successorRows is None:
+            self._packSuccessors()
 
+        # each method gets its own loop, so there is no method check per generated word
+        if method == "max":
+            self._generateMax(generatedWords, length)
+        elif method == "sample":
+            self._generateSample(generatedWords, length)
+
+        return " ".join(generatedWords)
+
+    def _generateMax(self, generatedWords, length):
+        """
+        The "max" loop of generateText, appends up to length words to generatedWords.
+
+        Walks the packed rows instead of rebuilding a context tuple every step.
+        The best entry of a row gives the next word and the row we move to next
+        """
+        # everything the loop touches is pulled into locals first, attribute lookups
+        # per generated word add up
+        idWord = self.idWord
+        nextIds = self.nextIds
+        bestEntry = self.bestEntry
+        successorRows = self.successorRows
+        append = generatedWords.append
+
+        row = self.contextId.get(tuple(generatedWords[-self.order :]), -1)
         for _ in range(length):
-            currentContext = tuple(generatedWords[-self.order :])
-            nextWord = self.predictNext(currentContext, method=method)
+            if row < 0:
+                row = self._generateUnpacked(generatedWords, "max")
+                if row is None:
+                    break
+                continue
+            entry = bestEntry[row]
+            append(idWord[nextIds[entry]])
+            row = successorRows[entry]
+
+    def _generateSample(self, generatedWords, length):
+        """
+        The "sample" loop of generateText, appends up to length words to generatedWords.
 
-            if nextWord is None:
-                break
+        Same row walk as _generateMax, but the entry is picked by bisecting the row's
+        running totals. Only the start context is ever hashed, every later step
+        moves to the next row through successorRows
+        """
+        idWord = self.idWord
+        contextPtr = self.contextPtr
+        nextIds = self.nextIds
+        nextTotals = self.nextTotals
+        successorRows = self.successorRows
+        rand = random.random
+        append = generatedWords.append
+
+        row = self.contextId.get(tuple(generatedWords[-self.order :]), -1)
+        for _ in range(length):
+            if row < 0:
+                row = self._generateUnpacked(generatedWords, "sample")
+                if row is None:
+                    break
+                continue
+            start, end = contextPtr[row], contextPtr[row + 1]
+            entry = bisect_right(nextTotals, rand() * nextTotals[end - 1], start, end)
+            append(idWord[nextIds[entry]])
+            row = successorRows[entry]
+
+    def _generateUnpacked(self, generatedWords, method):
+        """
+        One generation step for a context with no packed row, i.e. one added after
+        finalize() (or never seen). Asks _predictNextCtx, the same as predictNext would,
+        so generateText stays equal to calling predictNext over and over
 
-            generatedWords.append(nextWord)
-        return " ".join(generatedWords)
+        Returns:
+            The row of the new context (-1 if it has none) after appending the word,
+            or None if there is no next word and generation should stop
+        """
+        order = self.order
+        nextWord = self._predictNextCtx(tuple(generatedWords[-order:]), method)
+        if nextWord is None:
+            return None
+        generatedWords.append(nextWord)
+        return self.contextId.get(tuple(generatedWords[-order:]), -1)
 
     def getStats(self):
         """
@@ -256,3 +563,42 @@ class Markovchain:
             "uniqueContexts": len(self.transitions),
             "totalTransitions": self.transistionCount,
         }
+
+    def topNext(self, context, k=5):
+        """
+        Get the k most frequent next words after a given context.
+
+        Args:
+            context: The context to look up (string for order=1, tuple otherwise)
+            k: How many words to return
+
+        Returns:
+            List of (word, count) pairs, most frequent first
+            Returns empty list if context not found in training data
+
+        Example:
+            model.topNext("the", k=2)->[("cat", 5), ("dog", 3)]
+        """
+        if isinstance(context, str):
+            context = (context,)
+
+        # nlargest keeps a heap of size k instead of sorting the whole fanout
+        nextWords = self.transitions.get(context, {})
+        return heapq.nlargest(k, nextWords.items(), key=itemgetter(1))
+
+    def topContexts(self, k=5):
+        """
+        Get the k contexts we saw most often during training.
+
+        Returns:
+            List of (context, count) pairs, most frequent first.
+            count is how many times the context was followed by any word
+
+        Example:
+            model.topContexts(k=2)->[(("of", "the"), 812), (("in", "the"), 640)]
+        """
+        self._ensurePacked()
+
+        # a row's total is the last running total of that row
+        totals = (self.nextTotals[end - 1] for end in self.contextPtr[1:])
+        return heapq.nlargest(k, zip(self.contextId, totals), key=itemgetter(1))
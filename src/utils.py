@@ -0,0 +1,52 @@
+"""
+Helpers for feeding big corpora to the Markov chain.
+
+Reading a whole Gutenberg dump with f.read() and then splitting it keeps two
+full copies of the corpus in memory. These helpers memory-map the file and
+hand out one normalized token at a time instead.
+"""
+
+import mmap
+import os
+import re
+import sys
+
+SPACE_PATTERN = re.compile(rb"\s")
+BLOCK_SIZE = 1 << 24
+
+
+def streamTokens(filepath, blockSize=BLOCK_SIZE):
+    """
+    Yield the words of a file one by one,
+    normalized the same way as Markovchain.tokenize
+
+    The file is memory-mapped and handled blockSize bytes at a time. Each block is
+    cut at a whitespace byte (so no word or utf-8 character is split), then decoded,
+    lowercased and split in one go, which keeps the per-word work in C
+
+    Args:
+        filepath: Path to a (utf-8) text file
+        blockSize: Roughly how many bytes to decode at once
+
+    Yields:
+        Lowercased, interned words
+
+    Example:
+        list(streamTokens("cats.txt")) -> ["the", "cat", "sat", ...]
+    """
+    with open(filepath, "rb") as f:
+        # mmap refuses empty files
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                space = SPACE_PATTERN.search(mm, min(start + blockSize, size))
+                end = space.start() if space else size
+
+                block = mm[start:end].decode("utf-8", "ignore").lower()
+                yield from map(sys.intern, block.split())
+
+                start = end
@@ -0,0 +1,9 @@
+"""
+pytest setup: put the repo root on sys.path once at collection time,
+so `from src.markov_chain import Markovchain` works however pytest is started.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
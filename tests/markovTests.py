@@ -4,18 +4,54 @@ Unit tests for Markovchain - next word prediction.
 Tests cover:
     - Tokenization
     - Training and vocabulary building
+    - Streaming training from a file
     - Transition counting
     - Prediction (max and sample methods)
     - Text generation
     - Model statistics
+
+Run from the repo root, so `src` is importable:
+    python -m tests.markovTests
+    python -m unittest tests.markovTests
+
+Set PUREMARKOV_VERBOSE=1 to get a line per test from `python -m tests.markovTests`.
 """
 
 import unittest
 import sys
 import os
+import random
+import tempfile
+import copy
+import functools
+import io
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Mapping
 
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.markov_chain import Markovchain
+from src.utils import streamTokens
+
+
+# shared corpora, one object each, so every test and cache sees the same string
+_TEXT_SIMPLE = "the cat sat on the mat the dog sat on the floor"
+_TEXT_MULTI = """
+        the cat sat on the mat
+        the dog sat on the floor
+        the bird sat on the tree
+        """
+
+
+@functools.lru_cache(maxsize=None)
+def _trained(text, order):
+    """
+    Train a model on text once and hand the same one out on every later call.
+    Models from here are shared between tests, so treat them as read-only.
+    They are packed up front, so tests can read the packed tables straight away.
+    """
+    model = Markovchain(order=order)
+    model.train(text)
+    model.finalize()
+    return model
 
 
 class TestTokenization(unittest.TestCase):
@@ -48,148 +84,275 @@ class TestTokenization(unittest.TestCase):
         self.assertIn("sat,", tokens)
         self.assertIn("mat.", tokens)
 
+    def testTokenizeInternsRepeatedWords(self):
+        """Test that repeated words share one string object."""
+        tokens = self.model.tokenize("The cat saw the dog")
+        self.assertIs(tokens[0], tokens[3])
+
+    def testTokenizeCachedResultIsFreshList(self):
+        """Test that mutating a cached tokenization does not leak into the next call."""
+        text = "the cat sat on the mat"
+        tokens = self.model.tokenize(text)
+        tokens.append("extra")
+
+        expected = ["the", "cat", "sat", "on", "the", "mat"]
+        self.assertEqual(self.model.tokenize(text), expected)
+
 
 class TestTraining(unittest.TestCase):
     """Test model training."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.model = Markovchain(order=1)
-        self.simpleText = "the cat sat on the mat the dog sat on the floor"
+    text = _TEXT_SIMPLE
+
+    @classmethod
+    def setUpClass(cls):
+        """Train the shared (read-only) models once for the whole class."""
+        cls.model = _trained(cls.text, 1)
 
     def testTrainingBuildsVocabulary(self):
         """Test that training builds vocabulary."""
-        self.model.train(self.simpleText)
         self.assertGreater(len(self.model.vocabulary), 0)
         self.assertIn("the", self.model.vocabulary)
         self.assertIn("cat", self.model.vocabulary)
 
+    def testTrainingVocabularyMatchesWords(self):
+        """Test that the vocabulary holds exactly the words seen in transitions."""
+        self.assertEqual(self.model.vocabulary, set(self.text.split()))
+
+        # too short for a single transition, so nothing is learned
+        model = _trained("the cat", 3)
+        self.assertEqual(model.vocabulary, set())
+
     def testTrainingCountsTransitions(self):
         """Test that transitions are counted."""
-        self.model.train(self.simpleText)
-
         transitions = self.model.getTransitions("the")
         self.assertGreater(len(transitions), 0)
 
-    def testTrainingOrder1(self):
-        """Test training with order=1."""
-        model = Markovchain(order=1)
-        model.train("a b c a b c")
+    def testTrainingAllOrders(self):
+        """Test training with order=1, 2 and 3."""
+        # (text, context, expected next-word counts) for each order
+        cases = {
+            1: ("a b c a b c", "a", {"b": 2}),
+            2: ("a b c a b c", ("a", "b"), {"c": 2}),
+            3: ("a b c d a b c d", ("a", "b", "c"), {"d": 2}),
+        }
+        for order, (text, context, expected) in cases.items():
+            with self.subTest(order=order):
+                transitions = _trained(text, order).getTransitions(context)
+                self.assertEqual(dict(transitions), expected)
 
-        # Should have transitions from single words
-        transitions = model.getTransitions("a")
-        self.assertEqual(transitions["b"], 2)
 
-    def testTrainingOrder2(self):
-        """Test training with order=2."""
-        model = Markovchain(order=2)
-        model.train("a b c a b c")
+class TestStreaming(unittest.TestCase):
+    """Test streaming training."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.text = "The cat sat on the mat the dog sat on the floor"
+
+    def testStreamTokensMatchesTokenize(self):
+        """Test that streamed file tokens match tokenize."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.text)
+
+            tokens = list(streamTokens(path))
 
-        # Should have transitions from word pairs
-        transitions = model.getTransitions(("a", "b"))
-        self.assertEqual(transitions["c"], 2)
+        self.assertEqual(tokens, Markovchain().tokenize(self.text))
 
-    def testTrainingOrder3(self):
-        """Test training with order=3."""
-        model = Markovchain(order=3)
-        model.train("a b c d a b c d")
+    def testStreamTokensSmallBlocks(self):
+        """Test that block boundaries never split a word."""
+        text = "Über café\nnaïve  THE end\tof the line "
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
 
-        # Should have transitions from word triplets
-        transitions = model.getTransitions(("a", "b", "c"))
-        self.assertEqual(transitions["d"], 2)
+            for blockSize in [1, 3, 7, 1 << 20]:
+                tokens = list(streamTokens(path, blockSize=blockSize))
+                self.assertEqual(tokens, Markovchain().tokenize(text))
+
+    def testTrainStreamMatchesTrain(self):
+        """Test that chunked stream training learns the same counts as train."""
+        for order in [0, 1, 2, 3]:
+            model = _trained(self.text, order)
+
+            streamed = Markovchain(order=order)
+            streamed.trainStream(iter(streamed.tokenize(self.text)), chunkSize=4)
+
+            self.assertEqual(streamed.getStats(), model.getStats())
+            for context in model.transitions:
+                self.assertEqual(
+                    streamed.getTransitions(context), model.getTransitions(context)
+                )
 
 
 class TestTransitions(unittest.TestCase):
     """Test transition lookup."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.model = Markovchain(order=1)
-        self.text = "the cat sat on the mat the dog sat on the floor"
+    text = _TEXT_SIMPLE
 
-    def testGetTransitionsReturnsDict(self):
-        """Test that getTransitions returns a dictionary."""
-        self.model.train(self.text)
+    @classmethod
+    def setUpClass(cls):
+        """Train the shared (read-only) models once for the whole class."""
+        cls.model = _trained(cls.text, 1)
+        cls.model2 = _trained(cls.text, 2)
+        cls.model3 = _trained(cls.text, 3)
 
+    def testGetTransitionsReturnsMapping(self):
+        """Test that getTransitions returns a read-only mapping."""
         transitions = self.model.getTransitions("the")
-        self.assertIsInstance(transitions, dict)
+        self.assertIsInstance(transitions, Mapping)
+        with self.assertRaises(TypeError):
+            transitions["cat"] = 10
+
+    def testGetTransitionsMissingWordRaises(self):
+        """Test that reading a missing next word raises and leaves the model alone."""
+        transitions = self.model.getTransitions("the")
+        size = len(transitions)
+        with self.assertRaises(KeyError):
+            transitions["missing"]
+        self.assertEqual(len(self.model.getTransitions("the")), size)
+        self.assertNotIn("missing", self.model.transitions[("the",)])
 
     def testGetTransitionsUnknownWord(self):
         """Test getTransitions with unknown word returns empty dict."""
-        self.model.train(self.text)
-
         transitions = self.model.getTransitions("unknown")
         self.assertEqual(transitions, {})
 
+        # every miss shares one empty mapping instead of building a new one
+        self.assertIs(transitions, self.model.getTransitions("nowhere"))
+        with self.assertRaises(KeyError):
+            transitions["cat"]
+
     def testGetTransitionsStringContext(self):
         """Test getTransitions with string context (order=1)."""
-        self.model.train(self.text)
-
         transitions = self.model.getTransitions("the")
         self.assertGreater(len(transitions), 0)
 
     def testGetTransitionsTupleContext(self):
         """Test getTransitions with tuple context (order=2)."""
-        model = Markovchain(order=2)
-        model.train(self.text)
+        transitions = self.model2.getTransitions(("the", "cat"))
+        self.assertIsInstance(transitions, Mapping)
 
-        transitions = model.getTransitions(("the", "cat"))
-        self.assertIsInstance(transitions, dict)
+    def testFinalizePacksRows(self):
+        """Test that the packed arrays hold the same counts as the transitions."""
+        row = self.model.contextId[("the",)]
+        start, end = self.model.contextPtr[row], self.model.contextPtr[row + 1]
+        words = [self.model.idWord[i] for i in self.model.nextIds[start:end]]
+        totals = self.model.nextTotals[start:end]
+        counts = [total - before for before, total in zip([0, *totals], totals)]
+        self.assertEqual(dict(zip(words, counts)), self.model.getTransitions("the"))
 
 
 class TestPrediction(unittest.TestCase):
     """Test next word prediction."""
 
+    text = _TEXT_SIMPLE
+
+    @classmethod
+    def setUpClass(cls):
+        """Train the shared (read-only) models once for the whole class."""
+        cls.model = _trained(cls.text, 1)
+        cls.model2 = _trained(cls.text, 2)
+        cls.model3 = _trained(cls.text, 3)
+        cls.expectedMax = cls.model.predictNext("the", method="max")
+
     def setUp(self):
-        """Set up test fixtures."""
-        self.model = Markovchain(order=1)
-        self.text = "the cat sat on the mat the dog sat on the floor"
+        """Seed the RNG so sampling tests draw the same words on every run."""
+        random.seed(0)
 
     def testPredictNextReturnsString(self):
         """Test that predictNext returns a string."""
-        self.model.train(self.text)
-
         pred = self.model.predictNext("the", method="max")
         self.assertIsInstance(pred, str)
 
     def testPredictNextUnknownWord(self):
         """Test predictNext with unknown word returns None."""
-        self.model.train(self.text)
-
         pred = self.model.predictNext("xyz", method="max")
         self.assertIsNone(pred)
 
     def testPredictNextMaxDeterministic(self):
         """Test that max method is deterministic."""
-        self.model.train(self.text)
+        pred = self.model.predictNext("the", method="max")
+        self.assertEqual(pred, self.expectedMax)
+
+    def testBestEntry(self):
+        """Test that the packed best entry is the most frequent next word."""
+        transitions = self.model.getTransitions("sat")
+        self.assertEqual(
+            self.model.predictNext("sat"), max(transitions, key=transitions.get)
+        )
+
+    def testPredictNextMaxBeforeFinalize(self):
+        """Test max prediction for a context added after finalize."""
+        # this test edits the model, so work on a copy of the shared one
+        model = copy.deepcopy(self.model)
+        model.transitions[("xyz",)].update({"a": 1, "b": 3, "c": 3})
+
+        pred = model.predictNext("xyz", method="max")
+        self.assertEqual(pred, "b")
+
+        pred = model.predictNext("xyz", method="sample")
+        self.assertIn(pred, {"a", "b", "c"})
+
+    def testFinalizeSkipsEmptyRows(self):
+        """Test that an empty context row does not break finalize or prediction."""
+        # this test edits the model, so work on a copy of the shared one
+        model = copy.deepcopy(self.model)
+        model.transitions[("q",)]
+        model.finalize()
+
+        self.assertNotIn(("q",), model.contextId)
+        self.assertIsNone(model.predictNext("q", method="max"))
+        self.assertIsNone(model.predictNext("q", method="sample"))
+        self.assertEqual(model.predictNext("the"), self.model.predictNext("the"))
+
+    def testPackedOnFirstPrediction(self):
+        """Test that training only packs the model once it is asked for a prediction."""
+        model = Markovchain(order=1)
+        model.train("a b a c a b")
+        self.assertEqual(model.contextId, {})
 
-        pred1 = self.model.predictNext("the", method="max")
-        pred2 = self.model.predictNext("the", method="max")
+        self.assertEqual(model.predictNext("a"), "b")
+        self.assertIn(("a",), model.contextId)
 
-        self.assertEqual(pred1, pred2)
+        # training again leaves the packed tables stale until the next prediction
+        model.train("a c a c a c")
+        self.assertEqual(model.predictNext("a"), "c")
 
     def testPredictNextSampleIsValid(self):
         """Test that sample method returns valid word."""
-        self.model.train(self.text)
+        valid = frozenset(self.model.getTransitions("the"))
+        draws = {self.model.predictNext("the", method="sample") for _ in range(5)}
+        self.assertLessEqual(draws, valid)
+
+    def testSampleTableTotals(self):
+        """Test that the sampling table ends at the total count for a context."""
+        row = self.model.contextId[("the",)]
+        end = self.model.contextPtr[row + 1]
+        transitions = self.model.getTransitions("the")
+        self.assertEqual(self.model.nextTotals[end - 1], sum(transitions.values()))
+
+    def testPredictNextSampleFollowsCounts(self):
+        """Test that sampling from the cached totals follows the counts."""
+        model = _trained("a b a c a b a b", 1)
+
+        random.seed(3)
+        draws = [model.predictNext("a", method="sample") for _ in range(4000)]
 
-        for _ in range(5):
-            pred = self.model.predictNext("the", method="sample")
-            self.assertIn(pred, self.model.getTransitions("the").keys())
+        # after "a" we saw b 3 times and c once
+        self.assertEqual(set(draws), {"b", "c"})
+        self.assertAlmostEqual(draws.count("b") / len(draws), 0.75, delta=0.03)
 
     def testPredictNextOrder2(self):
         """Test prediction with order=2."""
-        model = Markovchain(order=2)
-        model.train(self.text)
-
-        pred = model.predictNext(("the", "cat"), method="max")
+        pred = self.model2.predictNext(("the", "cat"), method="max")
         self.assertIsNotNone(pred)
 
     def testPredictNextOrder3(self):
         """Test prediction with order=3."""
-        model = Markovchain(order=3)
-        model.train(self.text)
-
-        pred = model.predictNext(("the", "cat", "sat"), method="max")
+        pred = self.model3.predictNext(("the", "cat", "sat"), method="max")
         # Might be None if context not found, but should not error
         self.assertTrue(pred is None or isinstance(pred, str))
 
@@ -197,88 +360,128 @@ class TestPrediction(unittest.TestCase):
 class TestTextGeneration(unittest.TestCase):
     """Test text generation."""
 
+    text = _TEXT_MULTI
+
+    @classmethod
+    def setUpClass(cls):
+        """Train the shared (read-only) models once for the whole class."""
+        cls.model = _trained(cls.text, 1)
+        cls.model2 = _trained(cls.text, 2)
+        cls.model3 = _trained(cls.text, 3)
+        cls.expectedMax = cls.model.generateText("the", length=50, method="max")
+
     def setUp(self):
-        """Set up test fixtures."""
-        self.model = Markovchain(order=1)
-        self.text = """
-        the cat sat on the mat
-        the dog sat on the floor
-        the bird sat on the tree
-        """
+        """Seed the RNG so sampling tests draw the same words on every run."""
+        random.seed(0)
 
     def testGenerateTextReturnsString(self):
         """Test that generateText returns a string."""
-        self.model.train(self.text)
-
         generated = self.model.generateText("the", length=5, method="max")
         self.assertIsInstance(generated, str)
 
     def testGenerateTextStartsWithContext(self):
         """Test that generated text starts with start context."""
-        self.model.train(self.text)
-
         generated = self.model.generateText("cat", length=5, method="max")
         words = generated.split()
         self.assertEqual(words[0], "cat")
 
     def testGenerateTextDeterministic(self):
         """Test that deterministic generation is consistent."""
-        self.model.train(self.text)
-
-        gen1 = self.model.generateText("the", length=10, method="max")
-        gen2 = self.model.generateText("the", length=10, method="max")
-
-        self.assertEqual(gen1, gen2)
+        generated = self.model.generateText("the", length=50, method="max")
+        self.assertEqual(generated, self.expectedMax)
 
     def testGenerateTextLength(self):
-        """Test generated text has correct length."""
-        self.model.train(self.text)
-
-        for length in [5, 10, 15]:
-            generated = self.model.generateText("the", length=length, method="max")
-            wordCount = len(generated.split())
-
-            # Should be at least 1, at most length
-            self.assertGreater(wordCount, 0)
-            self.assertLessEqual(wordCount, length + 1)
-
-    def testGenerateTextOrder2(self):
-        """Test text generation with order=2."""
-        model = Markovchain(order=2)
-        model.train(self.text)
-
-        generated = model.generateText(("the", "cat"), length=5, method="max")
-        self.assertGreater(len(generated), 0)
+        """Test generated text has correct length, for order=1 and order=2."""
+        starts = {1: "the", 2: ("the", "cat")}
+        models = {1: self.model, 2: self.model2}
+        for order, start in starts.items():
+            for length in [5, 10, 15]:
+                with self.subTest(order=order, length=length):
+                    generated = models[order].generateText(
+                        start, length=length, method="max"
+                    )
+                    wordCount = len(generated.split())
+
+                    # Should be at least the start words, at most those plus length
+                    self.assertGreaterEqual(wordCount, order)
+                    self.assertLessEqual(wordCount, length + order)
 
     def testGenerateTextSampleMethod(self):
         """Test text generation with sample method."""
-        self.model.train(self.text)
-
-        for _ in range(5):
-            generated = self.model.generateText("the", length=8, method="sample")
-            self.assertGreater(len(generated), 0)
-            self.assertTrue(generated.startswith("the"))
+        generated = self.model.generateText("the", length=8, method="sample")
+        self.assertGreater(len(generated), 0)
+        self.assertTrue(generated.startswith("the"))
+
+    def testGenerateTextMaxMatchesPredictNext(self):
+        """Test that max generation follows predictNext one step at a time."""
+        models = {1: self.model, 2: self.model2, 3: self.model3}
+        starts = [(1, "the"), (2, ("the", "cat")), (3, ("the", "cat", "sat"))]
+        for order, start in starts:
+            model = models[order]
+
+            words = list(start) if order > 1 else [start]
+            for _ in range(12):
+                nextWord = model.predictNext(tuple(words[-order:]), method="max")
+                if nextWord is None:
+                    break
+                words.append(nextWord)
+
+            generated = model.generateText(start, length=12, method="max")
+            self.assertEqual(generated, " ".join(words))
+
+    def testGenerateTextAfterFinalizeMatchesPredictNext(self):
+        """Test that generation follows contexts added after finalize."""
+        # this test edits the model, so work on a copy of the shared one
+        model = copy.deepcopy(self.model)
+        model.transitions[("xyz",)].update({"the": 2, "cat": 1})
+
+        words = ["xyz"]
+        for _ in range(6):
+            nextWord = model.predictNext(words[-1], method="max")
+            if nextWord is None:
+                break
+            words.append(nextWord)
+
+        generated = model.generateText("xyz", length=6, method="max")
+        self.assertEqual(generated, " ".join(words))
+        self.assertEqual(words[1], "the")
+
+        random.seed(5)
+        generated = model.generateText("xyz", length=6, method="sample")
+        self.assertIn(generated.split()[1], {"the", "cat"})
+
+    def testGenerateTextSampleMatchesPredictNext(self):
+        """Test that sample generation draws the same words as predictNext."""
+        random.seed(7)
+        words = ["the"]
+        for _ in range(12):
+            nextWord = self.model.predictNext(words[-1], method="sample")
+            if nextWord is None:
+                break
+            words.append(nextWord)
+
+        random.seed(7)
+        generated = self.model.generateText("the", length=12, method="sample")
+        self.assertEqual(generated, " ".join(words))
 
 
 class TestStatistics(unittest.TestCase):
     """Test model statistics."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.model = Markovchain(order=1)
-        self.text = "the cat sat on the mat the dog sat on the floor"
+    text = _TEXT_SIMPLE
+
+    @classmethod
+    def setUpClass(cls):
+        """Train the shared (read-only) models once for the whole class."""
+        cls.model = _trained(cls.text, 1)
 
     def testGetStatsReturnsDict(self):
         """Test that getStats returns a dictionary."""
-        self.model.train(self.text)
-
         stats = self.model.getStats()
         self.assertIsInstance(stats, dict)
 
     def testGetStatsHasRequiredKeys(self):
         """Test that stats dictionary has required keys."""
-        self.model.train(self.text)
-
         stats = self.model.getStats()
 
         self.assertIn("order", stats)
@@ -288,8 +491,6 @@ class TestStatistics(unittest.TestCase):
 
     def testGetStatsValuesArePositive(self):
         """Test that stats values are positive."""
-        self.model.train(self.text)
-
         stats = self.model.getStats()
 
         self.assertGreater(stats["order"], 0)
@@ -297,14 +498,28 @@ class TestStatistics(unittest.TestCase):
         self.assertGreater(stats["uniqueContexts"], 0)
         self.assertGreater(stats["totalTransitions"], 0)
 
+    def testTopContexts(self):
+        """Test that topContexts ranks contexts by how often they were seen."""
+        top = self.model.topContexts(k=3)
+        self.assertEqual(top[0], (("the",), 4))
+        self.assertEqual([count for _, count in top], [4, 2, 2])
+
+    def testTopNext(self):
+        """Test that topNext ranks next words by count."""
+        self.assertEqual(self.model.topNext("sat"), [("on", 2)])
+        self.assertEqual(len(self.model.topNext("the", k=2)), 2)
+        self.assertEqual(self.model.topNext("unknown"), [])
+
 
 class TestIntegration(unittest.TestCase):
     """Integration tests."""
 
+    text = _TEXT_SIMPLE
+
     def testFullWorkflowOrder1(self):
         """Test complete workflow with order=1."""
         model = Markovchain(order=1)
-        text = "the cat sat on the mat the dog sat on the floor"
+        text = self.text
 
         # Train
         model.train(text)
@@ -324,7 +539,7 @@ class TestIntegration(unittest.TestCase):
     def testFullWorkflowOrder2(self):
         """Test complete workflow with order=2."""
         model = Markovchain(order=2)
-        text = "the cat sat on the mat the dog sat on the floor"
+        text = self.text
 
         # Train
         model.train(text)
@@ -339,38 +554,72 @@ class TestIntegration(unittest.TestCase):
 
     def testConsistencyAcrossRuns(self):
         """Test that model is consistent across multiple runs."""
-        text = "the cat sat on the mat the dog sat on the floor"
+        text = self.text
 
-        # Train two models
-        model1 = Markovchain(order=1)
-        model1.train(text)
+        # a fresh model and the shared one are trained separately on the same text,
+        # so they should generate the exact same words
+        model = Markovchain(order=1)
+        model.train(text)
+        shared = _trained(text, 1)
 
-        model2 = Markovchain(order=1)
-        model2.train(text)
+        generated = model.generateText("the", length=50, method="max")
+        expected = shared.generateText("the", length=50, method="max")
+        self.assertEqual(generated, expected)
 
-        # Should give same predictions
-        pred1 = model1.predictNext("the", method="max")
-        pred2 = model2.predictNext("the", method="max")
 
-        self.assertEqual(pred1, pred2)
+def runTestGroup(names):
+    """
+    Run a group of TestCase classes, by name, in one process and return what
+    the parent needs to report them. Classes in a group run back to back,
+    so models they share come out of this process's _trained cache.
+    This runs in a worker process, so it only hands back plain (picklable) values.
+    """
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite(
+        loader.loadTestsFromTestCase(globals()[name]) for name in names
+    )
+    stream = io.StringIO()
+    if os.environ.get("PUREMARKOV_VERBOSE") == "1":
+        # a line per test, for debugging
+        result = unittest.TextTestRunner(stream=stream, verbosity=2).run(suite)
+    else:
+        # no per-test formatting, only the tracebacks of whatever failed
+        result = unittest.TestResult()
+        suite.run(result)
+        for flavour, problems in (("ERROR", result.errors), ("FAIL", result.failures)):
+            for test, trace in problems:
+                stream.write(f"{'=' * 70}\n{flavour}: {test}\n{'-' * 70}\n{trace}\n")
+
+    failures = [(str(test), trace) for test, trace in result.failures]
+    errors = [(str(test), trace) for test, trace in result.errors]
+    return stream.getvalue(), result.testsRun, failures, errors
 
 
 def runTests():
-    """Run all tests."""
-    loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-
-    # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestTokenization))
-    suite.addTests(loader.loadTestsFromTestCase(TestTraining))
-    suite.addTests(loader.loadTestsFromTestCase(TestTransitions))
-    suite.addTests(loader.loadTestsFromTestCase(TestPrediction))
-    suite.addTests(loader.loadTestsFromTestCase(TestTextGeneration))
-    suite.addTests(loader.loadTestsFromTestCase(TestStatistics))
-    suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
-
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
+    """Run every TestCase in this module, one process per group of classes."""
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+
+    # classes whose shared models are trained on the same corpus (their `text`)
+    # go to one worker, so each shared model is trained once there
+    # instead of once per class
+    groups = {}
+    for classSuite in suite:
+        for test in classSuite:
+            testCase = type(test)
+            key = getattr(testCase, "text", testCase.__name__)
+            names = groups.setdefault(key, [])
+            if testCase.__name__ not in names:
+                names.append(testCase.__name__)
+    groups = list(groups.values())
+
+    result = unittest.TestResult()
+    workers = min(len(groups), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for output, testsRun, failures, errors in pool.map(runTestGroup, groups):
+            sys.stderr.write(output)
+            result.testsRun += testsRun
+            result.failures.extend(failures)
+            result.errors.extend(errors)
 
     return result
 